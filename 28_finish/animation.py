@@ -0,0 +1,27 @@
+from settings import *
+
+class AnimationClock:
+	def __init__(self, frames):
+		self.frames = frames
+		self.frame_index = 0
+		self.image = self.frames[self.frame_index]
+
+	def update(self, dt):
+		self.frame_index += ANIMATION_SPEED * dt
+		self.frame_index = 0 if self.frame_index >= len(self.frames) else self.frame_index
+		self.image = self.frames[int(self.frame_index)]
+
+class AnimationClocks:
+	def __init__(self):
+		self.clocks = {}
+
+	def get(self, frames):
+		# one clock per frame set, shared by every sprite playing it
+		key = id(frames)
+		if key not in self.clocks:
+			self.clocks[key] = AnimationClock(frames)
+		return self.clocks[key]
+
+	def update(self, dt):
+		for clock in self.clocks.values():
+			clock.update(dt)
@@ -0,0 +1,28 @@
+import pygame
+from settings import *
+
+class Backdrop:
+	def __init__(self):
+		self.band_height = 20
+		self.line_padding = 3
+
+		# 3 horizon rectangles above the sea
+		self.band_surf = pygame.Surface((WINDOW_WIDTH, self.band_height)).convert()
+		self.band_surf.fill('green')
+		self.band_surf.set_colorkey('green')
+		pygame.draw.rect(self.band_surf, HORIZON_TOP_COLOR, (0,10,WINDOW_WIDTH,10))
+		pygame.draw.rect(self.band_surf, HORIZON_TOP_COLOR, (0,4,WINDOW_WIDTH,4))
+		pygame.draw.rect(self.band_surf, HORIZON_TOP_COLOR, (0,0,WINDOW_WIDTH,2))
+
+		# horizon line
+		self.line_surf = pygame.Surface((WINDOW_WIDTH, self.line_padding * 2 + 1)).convert()
+		self.line_surf.fill('green')
+		self.line_surf.set_colorkey('green')
+		pygame.draw.line(self.line_surf, HORIZON_COLOR, (0,self.line_padding), (WINDOW_WIDTH,self.line_padding), 3)
+
+	def draw_band(self, surface, horizon_y):
+		surface.blit(self.band_surf, (0,horizon_y - self.band_height))
+
+	def draw_sea(self, surface, horizon_y):
+		surface.fill(SEA_COLOR, (0,horizon_y,WINDOW_WIDTH,WINDOW_HEIGHT))
+		surface.blit(self.line_surf, (0,horizon_y - self.line_padding))
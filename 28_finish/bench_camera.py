@@ -0,0 +1,92 @@
+import os, sys
+from time import perf_counter
+from random import randint, seed
+
+if '--window' not in sys.argv:
+	os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
+import pygame
+from settings import *
+from renderer import set_renderer
+
+pygame.init()
+set_renderer()
+
+from level import CameraGroup
+from sprites import Generic
+
+SPRITE_COUNTS = (250, 500, 1000, 2000, 4000, 8000)
+FRAMES = 120
+REPEATS = 3
+
+class Anchor:
+	def __init__(self, center):
+		self.rect = pygame.Rect(0,0,1,1)
+		self.rect.center = center
+
+def legacy_draw(group, player):
+	# the per-sprite draw path CameraGroup used before the batched blits
+	group.offset.x = player.rect.centerx - WINDOW_WIDTH / 2
+	group.offset.y = player.rect.centery - WINDOW_HEIGHT / 2
+
+	for sprite in group:
+		if sprite.z == LEVEL_LAYERS['clouds']:
+			offset_rect = sprite.rect.copy()
+			offset_rect.center -= group.offset
+			group.display_surface.blit(sprite.image, offset_rect)
+
+	group.draw_horizon()
+	for sprite in group:
+		for layer in LEVEL_LAYERS.values():
+			if sprite.z == layer and sprite.z != LEVEL_LAYERS['clouds']:
+				offset_rect = sprite.rect.copy()
+				offset_rect.center -= group.offset
+				group.display_surface.blit(sprite.image, offset_rect)
+
+class UnbatchedGroup(CameraGroup):
+	# the same culled draw path, but one blit call per sprite
+	def submit(self, entries):
+		for surf, pos in entries:
+			self.display_surface.blit(surf, pos)
+
+def build_scene(count, width, size, group_class = CameraGroup):
+	seed(count)
+	surf = pygame.transform.scale(pygame.image.load('../graphics/terrain/land/X.png'), (size,size)).convert_alpha()
+	group = group_class()
+	group.horizon_y = WINDOW_HEIGHT
+	layers = list(LEVEL_LAYERS.values())
+	for i in range(count):
+		pos = (randint(0, width - TILE_SIZE), randint(0, WINDOW_HEIGHT - TILE_SIZE))
+		Generic(pos, surf, group, layers[i % len(layers)])
+	return group, Anchor((WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2))
+
+def measure(draw, group, player):
+	# the best of a few runs, so the columns are not skewed by whatever else the machine is doing
+	draw(group, player)
+	times = []
+	for repeat in range(REPEATS):
+		start = perf_counter()
+		for frame in range(FRAMES):
+			draw(group, player)
+		times.append((perf_counter() - start) / FRAMES * 1000)
+	return min(times)
+
+def run(name, width, size = TILE_SIZE):
+	print(f'{name}: {width // WINDOW_WIDTH} screen(s) wide, {size}px sprites, mean ms per frame over {FRAMES} frames, best of {REPEATS}')
+	print('  legacy: no culling, one blit per sprite')
+	print('  culled: CameraGroup.custom_draw with one blit per sprite')
+	print('  batched: CameraGroup.custom_draw with one blits call per run of sprites')
+	print(f'{"sprites":>8} {"legacy":>9} {"culled":>9} {"batched":>9} {"culling":>8} {"batching":>9}')
+	for count in SPRITE_COUNTS:
+		group, player = build_scene(count, width, size)
+		unbatched_group, player = build_scene(count, width, size, UnbatchedGroup)
+		legacy = measure(legacy_draw, group, player)
+		culled = measure(CameraGroup.custom_draw, unbatched_group, player)
+		batched = measure(CameraGroup.custom_draw, group, player)
+		print(f'{count:>8} {legacy:>9.3f} {culled:>9.3f} {batched:>9.3f} {legacy / culled:>7.1f}x {culled / batched:>8.2f}x')
+	print()
+
+if __name__ == '__main__':
+	run('on screen', WINDOW_WIDTH)
+	run('on screen, small sprites', WINDOW_WIDTH, 8)
+	run('long level', WINDOW_WIDTH * 50)
@@ -0,0 +1,141 @@
+import pygame
+import numpy as np
+from settings import *
+from spatial import SpatialHash
+
+class CollisionMap:
+	def __init__(self, terrain, blockers):
+		# grid aligned terrain lives in an occupancy map, everything else stays a sprite
+		self.blockers = blockers
+
+		cells = [(int(x // TILE_SIZE), int(y // TILE_SIZE)) for x, y in terrain]
+		self.left = min([col for col, row in cells], default = 0)
+		self.top = min([row for col, row in cells], default = 0)
+		self.width = max([col for col, row in cells], default = -1) - self.left + 1
+		self.height = max([row for col, row in cells], default = -1) - self.top + 1
+
+		self.cells = bytearray(self.width * self.height)
+		for col, row in cells:
+			self.cells[(row - self.top) * self.width + col - self.left] = 1
+		self.cell_array = np.frombuffer(self.cells, dtype = np.uint8)
+
+		# merged terrain bodies for rect collisions
+		self.terrain_rects = self.merge_cells()
+		self.terrain_hash = SpatialHash(COLLISION_CELL_SIZE)
+		for index, rect in enumerate(self.terrain_rects):
+			self.terrain_hash.insert(index, rect)
+		self.runs = {}
+
+		# static collision-only shapes, like the tops of palm trees
+		self.bodies = []
+		self.body_hash = SpatialHash(COLLISION_CELL_SIZE)
+
+	def merge_cells(self):
+		# greedy meshing: take the widest run in a row, then grow it down while the rows below match
+		claimed = bytearray(self.width * self.height)
+		rects = []
+		for row in range(self.height):
+			col = 0
+			while col < self.width:
+				index = row * self.width + col
+				if not self.cells[index] or claimed[index]:
+					col += 1
+					continue
+
+				width = 1
+				while col + width < self.width and self.cells[index + width] and not claimed[index + width]:
+					width += 1
+
+				height = 1
+				while row + height < self.height:
+					start = (row + height) * self.width + col
+					if not all(self.cells[start:start + width]) or any(claimed[start:start + width]):
+						break
+					height += 1
+
+				for claimed_row in range(row, row + height):
+					start = claimed_row * self.width + col
+					claimed[start:start + width] = b'\x01' * width
+
+				rects.append(pygame.Rect(
+					(col + self.left) * TILE_SIZE,
+					(row + self.top) * TILE_SIZE,
+					width * TILE_SIZE,
+					height * TILE_SIZE))
+				col += width
+		return rects
+
+	def add_body(self, pos, size):
+		rect = pygame.Rect(pos, size)
+		self.body_hash.insert(len(self.bodies), rect)
+		self.bodies.append(rect)
+
+	def get_bodies(self, rect):
+		bodies = [self.bodies[index] for index in sorted(self.body_hash.query(rect))]
+		return [body for body in bodies if body.colliderect(rect)]
+
+	def is_solid(self, col, row):
+		col -= self.left
+		row -= self.top
+		if 0 <= col < self.width and 0 <= row < self.height:
+			return self.cells[row * self.width + col] == 1
+		return False
+
+	def collide_terrain_points(self, points):
+		# occupancy lookup for a whole array of points at once
+		cols = (points[:, 0] // TILE_SIZE).astype(int) - self.left
+		rows = (points[:, 1] // TILE_SIZE).astype(int) - self.top
+		inside = (cols >= 0) & (cols < self.width) & (rows >= 0) & (rows < self.height)
+		solid = np.zeros(len(points), dtype = bool)
+		solid[inside] = self.cell_array[rows[inside] * self.width + cols[inside]] == 1
+		return solid
+
+	def get_cells(self, rect):
+		cols = range(rect.left // TILE_SIZE, (rect.right - 1) // TILE_SIZE + 1)
+		rows = range(rect.top // TILE_SIZE, (rect.bottom - 1) // TILE_SIZE + 1)
+		return [(col, row) for row in rows for col in cols if self.is_solid(col, row)]
+
+	def collide_point(self, point):
+		if self.is_solid(int(point[0] // TILE_SIZE), int(point[1] // TILE_SIZE)):
+			return True
+		bodies = [self.bodies[index] for index in self.body_hash.query_point(point)]
+		return any(body.collidepoint(point) for body in bodies) or bool(self.blockers.query_point(point))
+
+	def collide_rect(self, rect):
+		return bool(self.get_cells(rect)) or bool(self.get_bodies(rect)) or bool(self.blockers.query(rect))
+
+	def get_rects(self, rect):
+		terrain_rects = [self.terrain_rects[index] for index in sorted(self.terrain_hash.query(rect))]
+		terrain_rects = [terrain_rect for terrain_rect in terrain_rects if terrain_rect.colliderect(rect)]
+		return terrain_rects + self.get_bodies(rect) + [sprite.rect for sprite in self.blockers.query(rect)]
+
+	def get_runs(self, y):
+		# solid stretches crossing a horizontal line as sorted, merged (left, right) pairs
+		# blockers are all placed by the time this is asked, so lines can be cached
+		if y in self.runs:
+			return self.runs[y]
+
+		line = pygame.Rect(self.left * TILE_SIZE, y, self.width * TILE_SIZE, 1)
+		rects = [self.terrain_rects[index] for index in self.terrain_hash.query(line)]
+		rects += self.bodies + [sprite.rect for sprite in self.blockers]
+		runs = []
+		for left, right in sorted((rect.left, rect.right) for rect in rects if rect.top <= y < rect.bottom):
+			if runs and left <= runs[-1][1]:
+				runs[-1][1] = max(runs[-1][1], right)
+			else:
+				runs.append([left, right])
+		self.runs[y] = runs
+		return runs
+
+	def get_span(self, x, floor_y, wall_y):
+		# first blocked x on either side: no ground along floor_y or something solid along wall_y
+		for floor_left, floor_right in self.get_runs(floor_y):
+			if floor_left <= x < floor_right:
+				break
+		else:
+			return x, x
+
+		walls = self.get_runs(wall_y)
+		left = max([floor_left - 1] + [min(wall_right - 1, x) for wall_left, wall_right in walls if wall_left <= x])
+		right = min([floor_right] + [max(wall_left, x) for wall_left, wall_right in walls if wall_right > x])
+		return left, right
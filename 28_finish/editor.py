@@ -8,28 +8,28 @@ from settings import *
 from support import *
 
 from menu import Menu
+from backdrop import Backdrop
+from renderer import get_renderer
+from entities import CloudField
 from timer import Timer
 
-from random import choice, randint
 
 class Editor:
-	def __init__(self, land_tiles, switch):
+	def __init__(self, land_tiles, switch, atlas, clouds):
 		
 		# main setup 
-		self.display_surface = pygame.display.get_surface()
+		self.display_surface = get_renderer().surface
 		self.canvas_data = {}
 		self.switch = switch
 
 		# imports 
 		self.land_tiles = land_tiles
+		self.atlas = atlas
 		self.imports()
 
 		# clouds
-		self.current_clouds = []
-		self.cloud_surf = import_folder('../graphics/clouds')
-		self.cloud_timer = pygame.USEREVENT + 1
-		pygame.time.set_timer(self.cloud_timer, 2000)
-		self.startup_clouds()
+		self.clouds = CloudField(clouds, 40, (0, WINDOW_HEIGHT), (20,50))
+		self.screen_rect = pygame.Rect(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT)
 
 		# navigation
 		self.origin = vector()
@@ -48,6 +48,9 @@ class Editor:
 		# menu 
 		self.menu = Menu()
 
+		# sky
+		self.backdrop = Backdrop()
+
 		# objects
 		self.canvas_objects = pygame.sprite.Group()
 		self.foreground = pygame.sprite.Group()
@@ -119,14 +122,14 @@ class Editor:
 							self.canvas_data[cell].terrain_neighbors.append(name)
 
 	def imports(self):
-		self.water_bottom = load('../graphics/terrain/water/water_bottom.png').convert_alpha()
+		self.water_bottom = self.atlas.pack(load('../graphics/terrain/water/water_bottom.png').convert_alpha())
 		self.sky_handle_surf = load('../graphics/cursors/handle.png').convert_alpha()
 
 		# animations
 		self.animations = {}
 		for key, value in EDITOR_DATA.items():
 			if value['graphics']:
-				graphics = import_folder(value['graphics'])
+				graphics = self.atlas.pack(import_folder(value['graphics']))
 				self.animations[key] = {
 					'frame index': 0,
 					'frames': graphics,
@@ -225,8 +228,6 @@ class Editor:
 			self.canvas_add()
 			self.canvas_remove()
 
-			self.create_clouds(event)
-
 	def pan_input(self, event): 
 
 		# middle mouse button pressed / released 
@@ -420,46 +421,20 @@ class Editor:
 
 		# horizon lines
 		if y > 0:	
-			horizon_rect1 = pygame.Rect(0,y - 10,WINDOW_WIDTH,10)
-			horizon_rect2 = pygame.Rect(0,y - 16,WINDOW_WIDTH,4)
-			horizon_rect3 = pygame.Rect(0,y - 20,WINDOW_WIDTH,2)
-			pygame.draw.rect(self.display_surface, HORIZON_TOP_COLOR, horizon_rect1)
-			pygame.draw.rect(self.display_surface, HORIZON_TOP_COLOR, horizon_rect2)
-			pygame.draw.rect(self.display_surface, HORIZON_TOP_COLOR, horizon_rect3)
-
+			self.backdrop.draw_band(self.display_surface, y)
 			self.display_clouds(dt, y)
 
 		# sea 
 		if 0 < y < WINDOW_HEIGHT:
-			sea_rect = pygame.Rect(0,y,WINDOW_WIDTH,WINDOW_HEIGHT)
-			pygame.draw.rect(self.display_surface, SEA_COLOR, sea_rect)
-			pygame.draw.line(self.display_surface, HORIZON_COLOR, (0,y), (WINDOW_WIDTH,y),3)
+			self.backdrop.draw_sea(self.display_surface, y)
 		if y < 0:
 			self.display_surface.fill(SEA_COLOR)
 
 	def display_clouds(self, dt, horizon_y):
-		for cloud in self.current_clouds: # [{surf, pos, speed}]
-			cloud['pos'][0] -= cloud['speed'] * dt
-			x = cloud['pos'][0]
-			y = horizon_y - cloud['pos'][1]
-			self.display_surface.blit(cloud['surf'], (x,y))
-
-	def create_clouds(self, event):
-		if event.type == self.cloud_timer:
-			surf = choice(self.cloud_surf)
-			surf = pygame.transform.scale2x(surf) if randint(0,4) < 2 else surf
-		
-			pos = [WINDOW_WIDTH + randint(50,100),randint(0,WINDOW_HEIGHT)]
-			self.current_clouds.append({'surf': surf, 'pos': pos, 'speed': randint(20,50)})
-
-			# remove clouds
-			self.current_clouds = [cloud for cloud in self.current_clouds if cloud['pos'][0] > -400]
-
-	def startup_clouds(self):
-		for i in range(20):
-			surf = pygame.transform.scale2x(choice(self.cloud_surf)) if randint(0,4) < 2 else choice(self.cloud_surf)
-			pos = [randint(0, WINDOW_WIDTH),randint(0, WINDOW_HEIGHT)]
-			self.current_clouds.append({'surf': surf, 'pos': pos, 'speed': randint(20,50)})
+		self.clouds.horizon_y = horizon_y
+		self.clouds.update(dt, self.screen_rect)
+		for surf, x, y in self.clouds.get_blits(self.screen_rect, 1):
+			self.display_surface.blit(surf, (x,y))
 
 
 	# update
@@ -0,0 +1,217 @@
+import pygame
+import numpy as np
+from random import choice, randint
+
+from settings import *
+from support import get_mask
+
+class EntityStore:
+	# one kind of entity kept in parallel arrays and stepped as a batch
+	fields = ('pos', 'previous', 'velocity', 'animation', 'frame_index', 'lifetime')
+	sleeps = False
+	loops = True
+	pooled = False
+
+	def __init__(self, animations, z = LEVEL_LAYERS['main'], capacity = 64):
+		self.animations = animations
+		self.lengths = np.array([len(frames) for frames in animations])
+		self.sizes = np.array([frames[0].get_size() for frames in animations])
+		self.z = z
+		self.count = 0
+
+		self.pos = np.zeros((capacity, 2))
+		self.previous = np.zeros((capacity, 2))
+		self.velocity = np.zeros((capacity, 2))
+		self.animation = np.zeros(capacity, dtype = int)
+		self.frame_index = np.zeros(capacity)
+		self.lifetime = np.full(capacity, np.inf)
+
+	def __len__(self):
+		return self.count
+
+	def spawn(self, pos, velocity = (0,0), animation = 0, lifetime = np.inf):
+		if self.count == len(self.pos) and self.pooled:
+			# a full pool hands the oldest slot to the newcomer
+			oldest = np.zeros(self.count, dtype = bool)
+			oldest[0] = True
+			self.remove(oldest)
+		elif self.count == len(self.pos):
+			for name in self.fields:
+				array = getattr(self, name)
+				setattr(self, name, np.concatenate((array, np.zeros_like(array))))
+
+		index = self.count
+		self.pos[index] = pos
+		self.previous[index] = pos
+		self.velocity[index] = velocity
+		self.animation[index] = animation
+		self.frame_index[index] = 0
+		self.lifetime[index] = lifetime
+		self.count += 1
+		return index
+
+	def remove(self, expired):
+		# survivors keep their relative order, so index order stays spawn order
+		keep = ~expired
+		count = int(keep.sum())
+		for name in self.fields:
+			array = getattr(self, name)
+			array[:count] = array[:self.count][keep]
+		self.count = count
+
+	def get_rects(self, pos = None):
+		x, y = np.round(self.pos[:self.count] if pos is None else pos).T
+		width, height = self.sizes[self.animation[:self.count]].T
+		return x, y, width, height
+
+	def overlaps(self, rect, pos = None):
+		x, y, width, height = self.get_rects(pos)
+		return (x < rect.right) & (x + width > rect.left) & (y < rect.bottom) & (y + height > rect.top)
+
+	def get_frame(self, index):
+		return self.animations[self.animation[index]][int(self.frame_index[index])]
+
+	def steer(self, active):
+		pass
+
+	def get_expired(self):
+		return np.zeros(self.count, dtype = bool)
+
+	def update(self, dt, zone):
+		count = self.count
+		self.previous[:count] = self.pos[:count]
+		active = np.flatnonzero(self.overlaps(zone)) if self.sleeps else np.arange(count)
+		expired = np.zeros(count, dtype = bool)
+
+		# animation
+		self.frame_index[active] += ANIMATION_SPEED * dt
+		finished = self.frame_index[:count] >= self.lengths[self.animation[:count]]
+		if self.loops:
+			self.frame_index[:count][finished] = 0
+		else:
+			expired |= finished
+
+		# movement
+		self.steer(active)
+		self.pos[active] += self.velocity[active] * dt
+
+		# expiry
+		self.lifetime[active] -= dt
+		expired |= self.lifetime[:count] <= 0
+		expired |= self.get_expired()
+		if expired.any():
+			self.remove(expired)
+
+	def get_blits(self, camera_rect, alpha):
+		current = np.round(self.pos[:self.count])
+		previous = np.round(self.previous[:self.count])
+		pos = np.round(previous + (current - previous) * alpha)
+		for index in np.flatnonzero(self.overlaps(camera_rect, pos)):
+			yield self.get_frame(index), int(pos[index, 0]), int(pos[index, 1])
+
+	def collide_mask(self, sprite):
+		x, y, width, height = self.get_rects()
+		for index in np.flatnonzero(self.overlaps(sprite.rect)):
+			offset = (int(x[index]) - sprite.rect.x, int(y[index]) - sprite.rect.y)
+			if sprite.mask.overlap(get_mask(self.get_frame(index)), offset):
+				return True
+		return False
+
+class Teeth(EntityStore):
+	fields = EntityStore.fields + ('patrol',)
+	sleeps = True
+
+	def __init__(self, assets):
+		super().__init__([assets['run_left'], assets['run_right']])
+		self.patrol = np.zeros((len(self.pos), 2))
+		self.speed = 120
+
+	def spawn(self, pos):
+		# standing on the bottom edge of the tile
+		height = self.sizes[1][1]
+		direction = choice((1,-1))
+		index = super().spawn((pos[0], pos[1] + TILE_SIZE - height), (direction * self.speed, 0), int(direction > 0))
+		self.patrol[index] = self.pos[index, 0], self.pos[index, 0]
+		return index
+
+	def settle(self, collision_map):
+		# destroy teeth that are not on a floor, the others get their walkable span once
+		x, y, width, height = self.get_rects()
+		expired = np.zeros(self.count, dtype = bool)
+		for index in range(self.count):
+			rect = pygame.Rect(x[index], y[index], width[index], height[index])
+			if collision_map.collide_point(rect.midbottom + pygame.math.Vector2(0,10)):
+				self.patrol[index] = collision_map.get_span(rect.centerx, rect.bottom + 1, rect.centery)
+			else:
+				expired[index] = True
+		self.remove(expired)
+
+	def steer(self, active):
+		x = np.round(self.pos[active, 0])
+		width = self.sizes[self.animation[active], 0]
+		left, right = self.patrol[active].T
+
+		# the frame shown this step still faces the old way
+		self.animation[active] = self.velocity[active, 0] > 0
+
+		turn_left = (self.velocity[active, 0] > 0) & (x + width + 1 >= right)
+		self.velocity[active[turn_left], 0] *= -1
+		turn_right = (self.velocity[active, 0] < 0) & (x - 1 <= left)
+		self.velocity[active[turn_right], 0] *= -1
+
+class Pearls(EntityStore):
+	pooled = True
+
+	def __init__(self, surf, collision_map):
+		super().__init__([[surf]], capacity = PEARL_POOL_SIZE)
+		self.collision_map = collision_map
+		self.speed = 150
+
+	def spawn(self, pos, direction):
+		return super().spawn(pos, (direction * self.speed, 0), lifetime = 6)
+
+	def get_expired(self):
+		# pearls break on the first wall instead of flying through it
+		centers = self.pos[:self.count] + self.sizes[self.animation[:self.count]] / 2
+		return self.collision_map.collide_terrain_points(centers)
+
+class Particles(EntityStore):
+	loops = False
+	pooled = True
+
+	def __init__(self, frames):
+		super().__init__([frames], capacity = PARTICLE_POOL_SIZE)
+
+	def spawn(self, center):
+		width, height = self.sizes[0]
+		return super().spawn((center[0] - width // 2, center[1] - height // 2))
+
+class CloudField(EntityStore):
+	# a fixed set of clouds drifting left and wrapping around the view, so the cost does not grow with the level
+	pooled = True
+
+	def __init__(self, variants, count, heights, speeds):
+		surfs = variants['small'] + variants['large']
+		super().__init__([[surf] for surf in surfs], LEVEL_LAYERS['clouds'], count)
+		self.horizon_y = 0
+
+		# clouds wrap once they are a full cloud width out of view
+		self.margin = int(self.sizes[:, 0].max())
+		self.width = WINDOW_WIDTH + self.margin * 2
+
+		# y is kept as the height above the horizon
+		for i in range(count):
+			variant = choice(range(len(variants['small'])))
+			variant += len(variants['small']) if randint(0,5) > 3 else 0
+			self.spawn((randint(0, self.width), randint(*heights)), (-randint(*speeds), 0), variant)
+
+	def get_blits(self, camera_rect, alpha):
+		count = self.count
+		x = self.previous[:count, 0] + (self.pos[:count, 0] - self.previous[:count, 0]) * alpha
+		left = camera_rect.left - self.margin
+		pos = np.empty((count, 2))
+		pos[:, 0] = (x - left) % self.width + left
+		pos[:, 1] = self.horizon_y - self.pos[:count, 1]
+		pos = np.round(pos)
+		for index in np.flatnonzero(self.overlaps(camera_rect, pos)):
+			yield self.get_frame(index), int(pos[index, 0]), int(pos[index, 1])
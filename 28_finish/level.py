@@ -3,37 +3,36 @@ from pygame.math import Vector2 as vector
 
 from settings import *
 from support import *
+from spatial import SpatialHash, SpatialGroup
+from collision import CollisionMap
+from backdrop import Backdrop
+from renderer import get_renderer
+from animation import AnimationClocks
+from entities import EntityStore, Teeth, Pearls, Particles, CloudField
 
-from sprites import Generic, Block, Animated, Particle, Coin, Player, Spikes, Tooth, Shell, Cloud
+from sprites import Tile, AnimatedTile, Coin, Player, Spikes, Shell
 
-from random import choice, randint
+from heapq import merge
 
 class Level:
 	def __init__(self, grid, switch, asset_dict, audio):
-		self.display_surface = pygame.display.get_surface()
+		self.display_surface = get_renderer().target
 		self.switch = switch
 
 		# groups 
 		self.all_sprites = CameraGroup()
-		self.coin_sprites = pygame.sprite.Group()
-		self.damage_sprites = pygame.sprite.Group()
-		self.collision_sprites = pygame.sprite.Group()
+		self.animation_clocks = AnimationClocks()
+		self.coin_sprites = SpatialGroup()
+		self.damage_sprites = SpatialGroup()
+		self.collision_sprites = SpatialGroup(COLLISION_CELL_SIZE)
 		self.shell_sprites = pygame.sprite.Group()
 
 		self.build_level(grid, asset_dict, audio['jump'])
 
-		# level limits
-		self.level_limits = {
-		'left': -WINDOW_WIDTH,
-		'right': sorted(list(grid['terrain'].keys()), key = lambda pos: pos[0])[-1][0] + 500
-		}
-
 		# additional stuff
-		self.particle_surfs = asset_dict['particle']
-		self.cloud_surfs = asset_dict['clouds']
-		self.cloud_timer = pygame.USEREVENT + 2
-		pygame.time.set_timer(self.cloud_timer, 2000)
-		self.startup_clouds()
+		self.clouds = CloudField(asset_dict['clouds'], 20, (-50,600), (20,30))
+		self.clouds.horizon_y = self.horizon_y
+		self.all_sprites.add_store(self.clouds)
 
 		# sounds 
 		self.bg_music = audio['music']
@@ -47,78 +46,107 @@ class Level:
 		self.hit_sound.set_volume(0.3)
 
 	def build_level(self, grid, asset_dict, jump_sound):
+		self.collision_map = CollisionMap(grid['terrain'], self.collision_sprites)
+		self.bake_static_tiles(grid, asset_dict)
+		if BAKE_BG_PALMS:
+			self.bake_bg_palms(grid, asset_dict)
+
+		# dynamic entities live in arrays, registered where their sprites used to be drawn
+		self.teeth = Teeth(asset_dict['tooth'])
+		self.pearls = Pearls(asset_dict['pearl'], self.collision_map)
+		self.particles = Particles(asset_dict['particle'])
+		self.all_sprites.add_store(self.teeth)
+
 		for layer_name, layer in grid.items():
+			if layer_name == 'bg palms' and BAKE_BG_PALMS:
+				continue
+
 			for pos, data in layer.items():
-				if layer_name == 'terrain':
-					Generic(pos, asset_dict['land'][data], [self.all_sprites, self.collision_sprites])
-				if layer_name == 'water':
-					if data == 'top':
-						Animated(asset_dict['water top'], pos, self.all_sprites, LEVEL_LAYERS['water'])
-					else:
-						Generic(pos, asset_dict['water bottom'], self.all_sprites, LEVEL_LAYERS['water'])
+				if layer_name == 'water' and data == 'top':
+					AnimatedTile(self.animation_clocks.get(asset_dict['water top']), pos, self.all_sprites, LEVEL_LAYERS['water'])
 
 				match data:
-					case 0: self.player = Player(pos, asset_dict['player'], self.all_sprites, self.collision_sprites, jump_sound)
+					case 0: self.player = Player(pos, asset_dict['player'], self.all_sprites, self.collision_map, jump_sound)
 					case 1: 
 						self.horizon_y = pos[1]
 						self.all_sprites.horizon_y = pos[1]
 					# coins
-					case 4: Coin('gold', asset_dict['gold'], pos, [self.all_sprites, self.coin_sprites])
-					case 5: Coin('silver', asset_dict['silver'], pos, [self.all_sprites, self.coin_sprites])
-					case 6: Coin('diamond', asset_dict['diamond'], pos, [self.all_sprites, self.coin_sprites])
+					case 4: Coin('gold', self.animation_clocks.get(asset_dict['gold']), pos, [self.all_sprites, self.coin_sprites])
+					case 5: Coin('silver', self.animation_clocks.get(asset_dict['silver']), pos, [self.all_sprites, self.coin_sprites])
+					case 6: Coin('diamond', self.animation_clocks.get(asset_dict['diamond']), pos, [self.all_sprites, self.coin_sprites])
 
 					# enemies
 					case 7: Spikes(asset_dict['spikes'], pos, [self.all_sprites, self.damage_sprites])
-					case 8: 
-						Tooth(asset_dict['tooth'], pos, [self.all_sprites, self.damage_sprites], self.collision_sprites)
+					case 8: self.teeth.spawn(pos)
 					case 9: 
 						Shell(
 							orientation = 'left', 
 							assets = asset_dict['shell'], 
 							pos =  pos, 
 							group =  [self.all_sprites, self.collision_sprites, self.shell_sprites],
-							pearl_surf = asset_dict['pearl'],
-							damage_sprites = self.damage_sprites)
+							pearls = self.pearls)
 					case 10: 
 						Shell(
 							orientation = 'right', 
 							assets = asset_dict['shell'], 
 							pos =  pos, 
 							group =  [self.all_sprites, self.collision_sprites, self.shell_sprites],
-							pearl_surf = asset_dict['pearl'],
-							damage_sprites = self.damage_sprites)
+							pearls = self.pearls)
 
 					# palm trees
 					case 11: 
-						Animated(asset_dict['palms']['small_fg'], pos, self.all_sprites)
-						Block(pos, (76,50), self.collision_sprites)
+						AnimatedTile(self.animation_clocks.get(asset_dict['palms']['small_fg']), pos, self.all_sprites)
+						self.collision_map.add_body(pos, (76,50))
 					case 12: 
-						Animated(asset_dict['palms']['large_fg'], pos, self.all_sprites)
-						Block(pos, (76,50), self.collision_sprites)
+						AnimatedTile(self.animation_clocks.get(asset_dict['palms']['large_fg']), pos, self.all_sprites)
+						self.collision_map.add_body(pos, (76,50))
 					case 13: 
-						Animated(asset_dict['palms']['left_fg'], pos, self.all_sprites)
-						Block(pos, (76,50), self.collision_sprites)
+						AnimatedTile(self.animation_clocks.get(asset_dict['palms']['left_fg']), pos, self.all_sprites)
+						self.collision_map.add_body(pos, (76,50))
 					case 14: 
-						Animated(asset_dict['palms']['right_fg'], pos, self.all_sprites)
-						Block(pos + vector(50,0), (76,50), self.collision_sprites)
+						AnimatedTile(self.animation_clocks.get(asset_dict['palms']['right_fg']), pos, self.all_sprites)
+						self.collision_map.add_body(pos + vector(50,0), (76,50))
 					
-					case 15: Animated(asset_dict['palms']['small_bg'], pos, self.all_sprites, LEVEL_LAYERS['bg'])
-					case 16: Animated(asset_dict['palms']['large_bg'], pos, self.all_sprites, LEVEL_LAYERS['bg'])
-					case 17: Animated(asset_dict['palms']['left_bg'], pos, self.all_sprites, LEVEL_LAYERS['bg'])
-					case 18: Animated(asset_dict['palms']['right_bg'], pos, self.all_sprites, LEVEL_LAYERS['bg'])
+					case 15: AnimatedTile(self.animation_clocks.get(asset_dict['palms']['small_bg']), pos, self.all_sprites, LEVEL_LAYERS['bg'])
+					case 16: AnimatedTile(self.animation_clocks.get(asset_dict['palms']['large_bg']), pos, self.all_sprites, LEVEL_LAYERS['bg'])
+					case 17: AnimatedTile(self.animation_clocks.get(asset_dict['palms']['left_bg']), pos, self.all_sprites, LEVEL_LAYERS['bg'])
+					case 18: AnimatedTile(self.animation_clocks.get(asset_dict['palms']['right_bg']), pos, self.all_sprites, LEVEL_LAYERS['bg'])
 
 		for sprite in self.shell_sprites:
 			sprite.player = self.player
 
+		# static queries wait until every solid is placed, so layer order does not matter
+		self.teeth.settle(self.collision_map)
+
+		self.all_sprites.add_store(self.pearls)
+		self.all_sprites.add_store(self.particles)
+
+	def bake_static_tiles(self, grid, asset_dict):
+		terrain_tiles = [(pos, asset_dict['land'][data]) for pos, data in grid['terrain'].items()]
+		for pos, surf in bake_chunks(terrain_tiles):
+			Tile(pos, surf, self.all_sprites)
+
+		water_tiles = [(pos, asset_dict['water bottom']) for pos, data in grid['water'].items() if data == 'bottom']
+		for pos, surf in bake_chunks(water_tiles):
+			Tile(pos, surf, self.all_sprites, LEVEL_LAYERS['water'])
+
+	def bake_bg_palms(self, grid, asset_dict):
+		palm_names = {15: 'small_bg', 16: 'large_bg', 17: 'left_bg', 18: 'right_bg'}
+		palms = [(pos, asset_dict['palms'][palm_names[data]]) for pos, data in grid['bg palms'].items()]
+		for pos, frames in bake_animated_chunks(palms):
+			AnimatedTile(self.animation_clocks.get(frames), pos, self.all_sprites, LEVEL_LAYERS['bg'])
+
 	def get_coins(self):
-		collided_coins = pygame.sprite.spritecollide(self.player, self.coin_sprites, True)
-		for sprite in collided_coins:
+		for sprite in self.coin_sprites.query(self.player.rect):
+			sprite.kill()
 			self.coin_sound.play()
-			Particle(self.particle_surfs, sprite.rect.center, self.all_sprites)
+			self.particles.spawn(sprite.rect.center)
 
 	def get_damage(self):
-		collision_sprites = pygame.sprite.spritecollide(self.player, self.damage_sprites, False, pygame.sprite.collide_mask)
-		if collision_sprites:
+		# rect broadphase first, masks only for the sprites actually overlapping
+		nearby_sprites = self.damage_sprites.query(self.player.rect)
+		if any(pygame.sprite.collide_mask(self.player, sprite) for sprite in nearby_sprites) \
+		or self.teeth.collide_mask(self.player) or self.pearls.collide_mask(self.player):
 			self.hit_sound.play()
 			self.player.damage()
 
@@ -131,72 +159,194 @@ class Level:
 				self.switch()
 				self.bg_music.stop()
 
-			if event.type == self.cloud_timer:
-				surf = choice(self.cloud_surfs)
-				surf = pygame.transform.scale2x(surf) if randint(0,5) > 3 else surf
-				x = self.level_limits['right'] + randint(100,300)
-				y = self.horizon_y - randint(-50,600)
-				Cloud((x,y), surf, self.all_sprites, self.level_limits['left'])
-
-	def startup_clouds(self):
-		for i in range(40):
-			surf = choice(self.cloud_surfs)
-			surf = pygame.transform.scale2x(surf) if randint(0,5) > 3 else surf
-			x = randint(self.level_limits['left'], self.level_limits['right'])
-			y = self.horizon_y - randint(-50,600)
-			Cloud((x,y), surf, self.all_sprites, self.level_limits['left'])
-
-	def run(self, dt):
-		# update
-		self.event_loop()
-		self.all_sprites.update(dt)
+	def update(self, dt):
+		self.animation_clocks.update(dt)
+		self.all_sprites.update(dt, self.player)
 		self.get_coins()
 		self.get_damage()
 
-		# drawing
+	def draw(self, alpha):
 		self.display_surface.fill(SKY_COLOR)
-		self.all_sprites.custom_draw(self.player)
+		self.all_sprites.custom_draw(self.player, alpha)
 
 class CameraGroup(pygame.sprite.Group):
 	def __init__(self):
 		super().__init__()
-		self.display_surface = pygame.display.get_surface()
+		self.display_surface = get_renderer().target
 		self.offset = vector()
+		self.backdrop = Backdrop()
+
+		# render queue
+		self.layers = {z: SpatialHash() for z in sorted(LEVEL_LAYERS.values())}
+		self.pending_sprites = set()
+		self.moving_sprites = set()
+		self.draw_order = {}
+		self.sprite_count = 0
+
+		# update queue, static sprites are only ever drawn
+		self.static_sprites = set()
+		self.dynamic_sprites = {}
+		self.sleepers = SpatialHash()
+		self.stores = []
+		self.tile_count = 0
+
+		# interpolation
+		self.previous_positions = {}
+
+		# visible runs per layer, kept until the camera reaches other cells or the layer changes
+		self.visible = {}
+		self.fast_blits = hasattr(self.display_surface, 'fblits')
+
+	def add_internal(self, sprite, layer = None):
+		super().add_internal(sprite, layer)
+		self.pending_sprites.add(sprite)
+		self.draw_order[sprite] = self.sprite_count
+		self.sprite_count += 1
+		if sprite.moving:
+			self.moving_sprites.add(sprite)
+		if type(sprite).update is pygame.sprite.Sprite.update:
+			self.static_sprites.add(sprite)
+		elif not sprite.sleeps:
+			self.dynamic_sprites[sprite] = None
+
+	def add_store(self, store):
+		# entity stores are drawn as one item at the point they were added
+		self.stores.append(store)
+		self.draw_order[store] = self.sprite_count
+		self.sprite_count += 1
+
+	def add_static(self, tile):
+		# tiles are drawn like sprites but never join the group
+		self.pending_sprites.add(tile)
+		self.draw_order[tile] = self.sprite_count
+		self.sprite_count += 1
+		self.tile_count += 1
+
+	def remove_internal(self, sprite):
+		super().remove_internal(sprite)
+		self.pending_sprites.discard(sprite)
+		self.moving_sprites.discard(sprite)
+		self.static_sprites.discard(sprite)
+		self.dynamic_sprites.pop(sprite, None)
+		del self.draw_order[sprite]
+		if sprite in self.layers[sprite.z]:
+			self.layers[sprite.z].remove(sprite)
+		if sprite in self.sleepers:
+			self.sleepers.remove(sprite)
+
+	def refresh(self):
+		# new sprites are hashed once their subclass has placed the rect
+		for sprite in self.pending_sprites:
+			self.layers[sprite.z].insert(sprite, sprite.rect)
+			if sprite.sleeps:
+				self.sleepers.insert(sprite, sprite.rect)
+		self.pending_sprites.clear()
+
+		for sprite in self.moving_sprites:
+			self.layers[sprite.z].move(sprite, sprite.rect)
+			if sprite.sleeps:
+				self.sleepers.move(sprite, sprite.rect)
+
+	def get_zone(self, player):
+		# enemies only run inside a margin around the camera and otherwise keep their state
+		zone = pygame.Rect(0, 0, WINDOW_WIDTH + ACTIVATION_MARGIN * 2, WINDOW_HEIGHT + ACTIVATION_MARGIN * 2)
+		zone.center = player.rect.center
+		return zone
+
+	def get_awake_sprites(self, zone):
+		sleepers = sorted([sprite for sprite in self.sleepers.query(zone) if sprite.rect.colliderect(zone)], key = self.draw_order.get)
+		return list(merge(self.dynamic_sprites, sleepers, key = self.draw_order.get))
+
+	def get_stats(self):
+		return {
+			'tiles': self.tile_count,
+			'static': len(self.static_sprites),
+			'dynamic': len(self.dynamic_sprites),
+			'sleepers': len(self.sleepers) + len([sprite for sprite in self.pending_sprites if sprite.sleeps]),
+			'entities': sum(len(store) for store in self.stores)}
+
+	def __repr__(self):
+		stats = ', '.join(f'{count} {name}' for name, count in self.get_stats().items())
+		return f'<{self.__class__.__name__}({len(self)} sprites, {stats})>'
+
+	def update(self, dt, player):
+		self.refresh()
+		zone = self.get_zone(player)
+		self.previous_positions = {sprite: sprite.rect.topleft for sprite in self.moving_sprites}
+		for store in self.stores:
+			store.update(dt, zone)
+		for sprite in self.get_awake_sprites(zone):
+			sprite.update(dt)
+
+	def interpolate(self, sprite, alpha):
+		# position between the last two simulation steps
+		if sprite in self.previous_positions:
+			x, y = self.previous_positions[sprite]
+			return x + (sprite.rect.x - x) * alpha, y + (sprite.rect.y - y) * alpha
+		return sprite.rect.x, sprite.rect.y
+
+	def get_visible(self, z, layer, camera_rect):
+		# runs of still sprites with their blit entries, each ended by a moving sprite or a store
+		key = (layer.get_bounds(camera_rect), layer.version, len(self.stores))
+		if z in self.visible and self.visible[z][0] == key:
+			return self.visible[z][1]
+
+		items = list(layer.query(camera_rect)) + [store for store in self.stores if store.z == z]
+		runs = []
+		sprites = []
+		for item in sorted(items, key = self.draw_order.get):
+			if isinstance(item, EntityStore) or item.moving:
+				runs.append((sprites, [[None, [0,0]] for sprite in sprites], item))
+				sprites = []
+			else:
+				sprites.append(item)
+		runs.append((sprites, [[None, [0,0]] for sprite in sprites], None))
+		self.visible[z] = (key, runs)
+		return runs
+
+	def submit(self, entries):
+		if self.fast_blits:
+			self.display_surface.fblits(entries)
+		else:
+			self.display_surface.blits(entries, doreturn = False)
+
+	def blit_layer(self, runs, camera_rect, alpha):
+		offset_x, offset_y = camera_rect.topleft
+		for sprites, entries, item in runs:
+			for sprite, entry in zip(sprites, entries):
+				entry[0] = sprite.image
+				pos = entry[1]
+				pos[0] = sprite.rect.x - offset_x
+				pos[1] = sprite.rect.y - offset_y
+			if entries:
+				self.submit(entries)
+
+			if isinstance(item, EntityStore):
+				self.submit([(surf, (x - offset_x, y - offset_y)) for surf, x, y in item.get_blits(camera_rect, alpha)])
+			elif item is not None:
+				x, y = self.interpolate(item, alpha)
+				self.display_surface.blit(item.image, (round(x) - offset_x, round(y) - offset_y))
 
 	def draw_horizon(self):
 		horizon_pos = self.horizon_y - self.offset.y	
 
 		if horizon_pos < WINDOW_HEIGHT:
-			sea_rect = pygame.Rect(0,horizon_pos,WINDOW_WIDTH,WINDOW_HEIGHT - horizon_pos)
-			pygame.draw.rect(self.display_surface, SEA_COLOR, sea_rect)
-
-			# horizon line 
-			# 3 extra rectangles 
-			horizon_rect1 = pygame.Rect(0,horizon_pos - 10,WINDOW_WIDTH,10)
-			horizon_rect2 = pygame.Rect(0,horizon_pos - 16,WINDOW_WIDTH,4)
-			horizon_rect3 = pygame.Rect(0,horizon_pos - 20,WINDOW_WIDTH,2)
-			pygame.draw.rect(self.display_surface, HORIZON_TOP_COLOR, horizon_rect1)
-			pygame.draw.rect(self.display_surface, HORIZON_TOP_COLOR, horizon_rect2)
-			pygame.draw.rect(self.display_surface, HORIZON_TOP_COLOR, horizon_rect3)
-			pygame.draw.line(self.display_surface, HORIZON_COLOR, (0,horizon_pos), (WINDOW_WIDTH,horizon_pos), 3)
+			self.backdrop.draw_band(self.display_surface, horizon_pos)
+			self.backdrop.draw_sea(self.display_surface, horizon_pos)
 
 		if horizon_pos < 0:
 			self.display_surface.fill(SEA_COLOR)
 
-	def custom_draw(self, player):
-		self.offset.x = player.rect.centerx - WINDOW_WIDTH / 2
-		self.offset.y = player.rect.centery - WINDOW_HEIGHT / 2
-
-		for sprite in self:
-			if sprite.z == LEVEL_LAYERS['clouds']:
-				offset_rect = sprite.rect.copy()
-				offset_rect.center -= self.offset
-				self.display_surface.blit(sprite.image, offset_rect)
-
-		self.draw_horizon()
-		for sprite in self:
-			for layer in LEVEL_LAYERS.values():
-				if sprite.z == layer and sprite.z != LEVEL_LAYERS['clouds']:
-					offset_rect = sprite.rect.copy()
-					offset_rect.center -= self.offset
-					self.display_surface.blit(sprite.image, offset_rect)
\ No newline at end of file
+	def custom_draw(self, player, alpha = 1):
+		player_x, player_y = self.interpolate(player, alpha)
+		self.offset.x = round(player_x) + player.rect.width // 2 - WINDOW_WIDTH / 2
+		self.offset.y = round(player_y) + player.rect.height // 2 - WINDOW_HEIGHT / 2
+
+		self.refresh()
+		camera_rect = pygame.Rect(self.offset, (WINDOW_WIDTH, WINDOW_HEIGHT))
+
+		for z, layer in self.layers.items():
+			if z == LEVEL_LAYERS['ocean']:
+				self.draw_horizon()
+
+			self.blit_layer(self.get_visible(z, layer, camera_rect), camera_rect, alpha)
\ No newline at end of file
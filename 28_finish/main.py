@@ -1,4 +1,4 @@
-import pygame
+import pygame, sys
 from pygame.math import Vector2 as vector
 from settings import *
 from support import *
@@ -7,19 +7,26 @@ from pygame.image import load
 
 from editor import Editor
 from level import Level
+from renderer import set_renderer, get_renderer
 
 from os import walk
 
 class Main:
-	def __init__(self):
+	def __init__(self, hardware = False, simulation_rate = SIMULATION_RATE):
 		pygame.init()
-		self.display_surface = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+		self.renderer = set_renderer(hardware)
+		self.display_surface = self.renderer.surface
 		self.clock = pygame.time.Clock()
+
+		# fixed timestep
+		self.step = 1 / simulation_rate
+		self.accumulator = 0
+		self.atlas = Atlas()
 		self.imports()
 
 		self.editor_active = True
 		self.transition = Transition(self.toggle)
-		self.editor = Editor(self.land_tiles, self.switch)
+		self.editor = Editor(self.land_tiles, self.switch, self.atlas, self.clouds)
 
 		# cursor 
 		surf = load('../graphics/cursors/mouse.png').convert_alpha()
@@ -28,30 +35,32 @@ class Main:
 
 	def imports(self):
 		# terrain
-		self.land_tiles = import_folder_dict('../graphics/terrain/land')
-		self.water_bottom = load('../graphics/terrain/water/water_bottom.png').convert_alpha()
-		self.water_top_animation = import_folder('../graphics/terrain/water/animation')
+		self.land_tiles = self.atlas.pack(import_folder_dict('../graphics/terrain/land'))
+		self.water_bottom = self.atlas.pack(load('../graphics/terrain/water/water_bottom.png').convert_alpha())
+		self.water_top_animation = self.atlas.pack(import_folder('../graphics/terrain/water/animation'))
 
 		# coins
-		self.gold = import_folder('../graphics/items/gold')
-		self.silver = import_folder('../graphics/items/silver')
-		self.diamond = import_folder('../graphics/items/diamond')
-		self.particle = import_folder('../graphics/items/particle')
+		self.gold = self.atlas.pack(import_folder('../graphics/items/gold'))
+		self.silver = self.atlas.pack(import_folder('../graphics/items/silver'))
+		self.diamond = self.atlas.pack(import_folder('../graphics/items/diamond'))
+		self.particle = self.atlas.pack(import_folder('../graphics/items/particle'))
 
 		# palm trees
-		self.palms = {folder: import_folder(f'../graphics/terrain/palm/{folder}') for folder in list(walk('../graphics/terrain/palm'))[0][1]}
+		self.palms = self.atlas.pack({folder: import_folder(f'../graphics/terrain/palm/{folder}') for folder in list(walk('../graphics/terrain/palm'))[0][1]})
 
 		# enemies
-		self.spikes = load('../graphics/enemies/spikes/spikes.png').convert_alpha()
-		self.tooth = {folder: import_folder(f'../graphics/enemies/tooth/{folder}') for folder in list(walk('../graphics/enemies/tooth'))[0][1]}
-		self.shell = {folder: import_folder(f'../graphics/enemies/shell_left/{folder}') for folder in list(walk('../graphics/enemies/shell_left/'))[0][1]}
-		self.pearl = load('../graphics/enemies/pearl/pearl.png').convert_alpha()
+		self.spikes = self.atlas.pack(load('../graphics/enemies/spikes/spikes.png').convert_alpha())
+		self.tooth = self.atlas.pack({folder: import_folder(f'../graphics/enemies/tooth/{folder}') for folder in list(walk('../graphics/enemies/tooth'))[0][1]})
+		self.shell = self.atlas.pack({folder: import_folder(f'../graphics/enemies/shell_left/{folder}') for folder in list(walk('../graphics/enemies/shell_left/'))[0][1]})
+		self.pearl = self.atlas.pack(load('../graphics/enemies/pearl/pearl.png').convert_alpha())
 
 		# player
-		self.player_graphics = {folder: import_folder(f'../graphics/player/{folder}') for folder in list(walk('../graphics/player/'))[0][1]}
+		self.player_graphics = self.atlas.pack({folder: import_folder(f'../graphics/player/{folder}') for folder in list(walk('../graphics/player/'))[0][1]})
 
-		# clouds
-		self.clouds = import_folder('../graphics/clouds')
+		# clouds, scaled once for the editor and every level
+		# the large variants stay out of the atlas, they would need a page of their own
+		clouds = self.atlas.pack(import_folder('../graphics/clouds'))
+		self.clouds = {'small': clouds, 'large': [pygame.transform.scale2x(surf) for surf in clouds]}
 
 		# sounds
 		self.level_sounds = {
@@ -69,6 +78,7 @@ class Main:
 	def switch(self, grid = None):
 		self.transition.active = True
 		if grid:
+			self.accumulator = 0
 			self.level = Level(
 				grid, 
 				self.switch,{
@@ -90,19 +100,24 @@ class Main:
 
 	def run(self):
 		while True:
-			dt = self.clock.tick() / 1000
+			dt = min(self.clock.tick() / 1000, MAX_FRAME_TIME)
 			
 			if self.editor_active:
 				self.editor.run(dt)
 			else:
-				self.level.run(dt)
+				self.level.event_loop()
+				self.accumulator += dt
+				while self.accumulator >= self.step:
+					self.level.update(self.step)
+					self.accumulator -= self.step
+				self.level.draw(self.accumulator / self.step)
 			self.transition.display(dt)
-			pygame.display.update()
+			self.renderer.present(overlay = self.editor_active or self.transition.active)
 
 
 class Transition:
 	def __init__(self, toggle):
-		self.display_surface = pygame.display.get_surface()
+		self.display_surface = get_renderer().surface
 		self.toggle = toggle
 		self.active = False
 
@@ -126,5 +141,7 @@ class Transition:
 			pygame.draw.circle(self.display_surface, 'black',self.center, self.radius, int(self.border_width))
 
 if __name__ == '__main__':
-	main = Main()
+	main = Main(hardware = '--hardware' in sys.argv)
+	if '--atlas-report' in sys.argv:
+		print(main.atlas.report())
 	main.run() 
\ No newline at end of file
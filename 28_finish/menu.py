@@ -1,10 +1,11 @@
 import pygame
 from settings import *
 from pygame.image import load
+from renderer import get_renderer
 
 class Menu:
 	def __init__(self):
-		self.display_surface = pygame.display.get_surface()
+		self.display_surface = get_renderer().surface
 		self.create_data()
 		self.create_buttons()
 
@@ -0,0 +1,95 @@
+import pygame
+from weakref import WeakKeyDictionary
+from settings import *
+
+try:
+	from pygame._sdl2.video import Window, Renderer, Texture
+except ImportError:
+	Renderer = None
+
+active_renderer = None
+
+def set_renderer(hardware = False):
+	global active_renderer
+	active_renderer = HardwareRenderer() if hardware and hardware_available() else SoftwareRenderer()
+	return active_renderer
+
+def get_renderer():
+	return active_renderer
+
+def hardware_available():
+	if Renderer is None:
+		return False
+
+	# _sdl2 raises its own error class, a sibling of pygame.error under RuntimeError
+	try:
+		window = Window(size = (1,1), hidden = True)
+	except RuntimeError:
+		return False
+
+	try:
+		renderer = Renderer(window, accelerated = 1)
+		del renderer
+		return True
+	except RuntimeError:
+		return False
+	finally:
+		window.destroy()
+
+class SoftwareRenderer:
+	def __init__(self):
+		self.hardware = False
+		self.surface = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+
+		# the level draws straight onto the display surface
+		self.target = self.surface
+
+	def present(self, overlay = True):
+		pygame.display.update()
+
+class HardwareRenderer:
+	def __init__(self):
+		self.hardware = True
+		pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SCALED)
+		self.renderer = Renderer.from_window(Window.from_display_module())
+		self.textures = WeakKeyDictionary()
+
+		# editor, menu and transition keep drawing in software onto an overlay
+		self.surface = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
+		self.overlay = Texture(self.renderer, (WINDOW_WIDTH, WINDOW_HEIGHT), streaming = True)
+		self.overlay.blend_mode = 1 # SDL_BLENDMODE_BLEND
+
+		# the level draws through the renderer
+		self.target = self
+
+	def get_texture(self, surf):
+		if surf not in self.textures:
+			parent = surf.get_abs_parent()
+			if parent is not surf: # atlas frames are drawn from their page texture
+				texture = self.get_texture(parent)[0]
+				self.textures[surf] = (texture, pygame.Rect(surf.get_abs_offset(), surf.get_size()))
+			else:
+				self.textures[surf] = (Texture.from_surface(self.renderer, surf), None)
+		return self.textures[surf]
+
+	def blit(self, surf, dest):
+		texture, area = self.get_texture(surf)
+		texture.draw(area, pygame.Rect(dest, surf.get_size()))
+
+	def blits(self, blit_sequence, doreturn = False):
+		for surf, dest in blit_sequence:
+			self.blit(surf, dest)
+
+	def fill(self, color, rect = None):
+		self.renderer.draw_color = pygame.Color(color)
+		if rect:
+			self.renderer.fill_rect(rect)
+		else:
+			self.renderer.clear()
+
+	def present(self, overlay = True):
+		if overlay:
+			self.overlay.update(self.surface)
+			self.overlay.draw()
+			self.surface.fill((0,0,0,0))
+		self.renderer.present()
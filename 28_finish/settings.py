@@ -3,6 +3,21 @@ TILE_SIZE = 64
 WINDOW_WIDTH = 1280
 WINDOW_HEIGHT = 720
 ANIMATION_SPEED = 8
+SPATIAL_CELL_SIZE = TILE_SIZE * 4
+COLLISION_CELL_SIZE = TILE_SIZE * 2
+ACTIVATION_MARGIN = TILE_SIZE * 4
+PEARL_POOL_SIZE = 64
+PARTICLE_POOL_SIZE = 32
+CHUNK_SIZE = 16
+CHUNK_MAX_WASTE = 1.5
+ATLAS_SIZE = 768
+# baked palms trade memory for blits: lone palms keep their shared frames, overlapping ones
+# are baked per cluster, a dense row of 79 palms 40px apart costs about 8.5 MiB on top of the 0.9 MiB of frames
+BAKE_BG_PALMS = True
+
+# simulation
+SIMULATION_RATE = 60
+MAX_FRAME_TIME = 0.25
 
 # editor graphics 
 EDITOR_DATA = {
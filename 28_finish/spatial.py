@@ -0,0 +1,106 @@
+import pygame
+from settings import *
+
+class SpatialHash:
+	def __init__(self, cell_size = SPATIAL_CELL_SIZE):
+		self.cell_size = cell_size
+		self.cells = {}
+		self.bounds = {}
+		self.version = 0
+
+	def get_bounds(self, rect):
+		return (
+			rect.left // self.cell_size,
+			rect.top // self.cell_size,
+			(rect.right - 1) // self.cell_size,
+			(rect.bottom - 1) // self.cell_size)
+
+	def insert(self, item, rect):
+		bounds = self.get_bounds(rect)
+		self.bounds[item] = bounds
+		self.version += 1
+		left, top, right, bottom = bounds
+		for col in range(left, right + 1):
+			for row in range(top, bottom + 1):
+				if (col,row) in self.cells:
+					self.cells[(col,row)].add(item)
+				else:
+					self.cells[(col,row)] = {item}
+
+	def remove(self, item):
+		left, top, right, bottom = self.bounds.pop(item)
+		self.version += 1
+		for col in range(left, right + 1):
+			for row in range(top, bottom + 1):
+				cell = self.cells[(col,row)]
+				cell.discard(item)
+				if not cell:
+					del self.cells[(col,row)]
+
+	def move(self, item, rect):
+		if self.bounds.get(item) != self.get_bounds(rect):
+			self.remove(item)
+			self.insert(item, rect)
+
+	def query(self, rect):
+		left, top, right, bottom = self.get_bounds(rect)
+		found = set()
+		for col in range(left, right + 1):
+			for row in range(top, bottom + 1):
+				if (col,row) in self.cells:
+					found.update(self.cells[(col,row)])
+		return found
+
+	def query_point(self, point):
+		cell = (int(point[0] // self.cell_size), int(point[1] // self.cell_size))
+		return set(self.cells.get(cell, ()))
+
+	def __contains__(self, item):
+		return item in self.bounds
+
+	def __len__(self):
+		return len(self.bounds)
+
+class SpatialGroup(pygame.sprite.Group):
+	def __init__(self, cell_size = SPATIAL_CELL_SIZE):
+		super().__init__()
+		self.spatial_hash = SpatialHash(cell_size)
+		self.pending_sprites = set()
+		self.moving_sprites = set()
+		self.sprite_order = {}
+		self.sprite_count = 0
+
+	def add_internal(self, sprite, layer = None):
+		super().add_internal(sprite, layer)
+		self.pending_sprites.add(sprite)
+		self.sprite_order[sprite] = self.sprite_count
+		self.sprite_count += 1
+		if sprite.moving:
+			self.moving_sprites.add(sprite)
+
+	def remove_internal(self, sprite):
+		super().remove_internal(sprite)
+		self.pending_sprites.discard(sprite)
+		self.moving_sprites.discard(sprite)
+		del self.sprite_order[sprite]
+		if sprite in self.spatial_hash:
+			self.spatial_hash.remove(sprite)
+
+	def refresh(self):
+		for sprite in self.pending_sprites:
+			self.spatial_hash.insert(sprite, sprite.rect)
+		self.pending_sprites.clear()
+
+		for sprite in self.moving_sprites:
+			self.spatial_hash.move(sprite, sprite.rect)
+
+	def query(self, rect):
+		# sprites overlapping rect, in the order they joined the group
+		self.refresh()
+		sprites = [sprite for sprite in self.spatial_hash.query(rect) if sprite.rect.colliderect(rect)]
+		return sorted(sprites, key = self.sprite_order.get)
+
+	def query_point(self, point):
+		self.refresh()
+		sprites = [sprite for sprite in self.spatial_hash.query_point(point) if sprite.rect.collidepoint(point)]
+		return sorted(sprites, key = self.sprite_order.get)
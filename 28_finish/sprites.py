@@ -3,67 +3,62 @@ from pygame.math import Vector2 as vector
 
 from settings import *
 from timer import Timer
-
-from random import choice, randint
+from support import get_mask, get_silhouette, get_mirrored
 
 class Generic(pygame.sprite.Sprite):
+	moving = False
+	sleeps = False
+
 	def __init__(self, pos, surf, group, z = LEVEL_LAYERS['main']):
 		super().__init__(group)
 		self.image = surf
 		self.rect = self.image.get_rect(topleft = pos)
 		self.z = z
 
-class Block(Generic):
-	def __init__(self, pos, size, group):
-		surf = pygame.Surface(size)
-		super().__init__(pos, surf, group)
+# static level pieces, drawn by the camera but never updated or killed
+class Tile:
+	__slots__ = ('image', 'rect', 'z')
+	moving = False
+	sleeps = False
 
-class Cloud(Generic):
-	def __init__(self, pos, surf, group, left_limit):
-		super().__init__(pos, surf, group, LEVEL_LAYERS['clouds'])
-		self.left_limit = left_limit
+	def __init__(self, pos, surf, group, z = LEVEL_LAYERS['main']):
+		self.image = surf
+		self.rect = surf.get_rect(topleft = pos)
+		self.z = z
+		group.add_static(self)
 
-		# movement
-		self.pos = vector(self.rect.topleft)
-		self.speed = randint(20,30)
+class AnimatedTile:
+	__slots__ = ('clock', 'rect', 'z')
+	moving = False
+	sleeps = False
 
-	def update(self, dt):
-		self.pos.x -= self.speed * dt
-		self.rect.x = round(self.pos.x)
-		if self.rect.x <= self.left_limit:
-			self.kill()
+	def __init__(self, clock, pos, group, z = LEVEL_LAYERS['main']):
+		self.clock = clock
+		self.rect = clock.image.get_rect(topleft = pos)
+		self.z = z
+		group.add_static(self)
+
+	@property
+	def image(self):
+		return self.clock.image
 
 
 # simple animated objects
 class Animated(Generic):
-	def __init__(self, assets, pos, group, z = LEVEL_LAYERS['main']):
-		self.animation_frames = assets
-		self.frame_index = 0
-		super().__init__(pos, self.animation_frames[self.frame_index], group, z)
-
-	def animate(self, dt):
-		self.frame_index += ANIMATION_SPEED * dt
-		self.frame_index = 0 if self.frame_index >= len(self.animation_frames) else self.frame_index
-		self.image = self.animation_frames[int(self.frame_index)]
-
-	def update(self, dt):
-		self.animate(dt)
+	def __init__(self, clock, pos, group, z = LEVEL_LAYERS['main']):
+		# the frame comes from a shared clock, so there is nothing to update per sprite
+		pygame.sprite.Sprite.__init__(self, group)
+		self.clock = clock
+		self.rect = self.image.get_rect(topleft = pos)
+		self.z = z
 
-class Particle(Animated):
-	def __init__(self, assets, pos, group):
-		super().__init__(assets, pos, group)
-		self.rect = self.image.get_rect(center = pos)
-
-	def animate(self, dt):
-		self.frame_index += ANIMATION_SPEED * dt
-		if self.frame_index < len(self.animation_frames):
-			self.image = self.animation_frames[int(self.frame_index)]
-		else:
-			self.kill()
+	@property
+	def image(self):
+		return self.clock.image
 
 class Coin(Animated):
-	def __init__(self, coin_type, assets, pos, group):
-		super().__init__(assets, pos, group)
+	def __init__(self, coin_type, clock, pos, group):
+		super().__init__(clock, pos, group)
 		self.rect = self.image.get_rect(center = pos)
 		self.coin_type = coin_type
 
@@ -72,74 +67,14 @@ class Coin(Animated):
 class Spikes(Generic):
 	def __init__(self, surf, pos, group):
 		super().__init__(pos, surf, group)
-		self.mask = pygame.mask.from_surface(self.image)
-
-class Tooth(Generic):
-	def __init__(self, assets, pos, group, collision_sprites):
-
-		# general setup
-		self.animation_frames = assets
-		self.frame_index = 0
-		self.orientation = 'right'
-		surf = self.animation_frames[f'run_{self.orientation}'][self.frame_index]
-		super().__init__(pos, surf, group)
-		self.rect.bottom = self.rect.top + TILE_SIZE
-		self.mask = pygame.mask.from_surface(self.image)
-
-		# movement
-		self.direction = vector(choice((1,-1)),0)
-		self.orientation = 'left' if self.direction.x < 0 else 'right'
-		self.pos = vector(self.rect.topleft)
-		self.speed = 120
-		self.collision_sprites = collision_sprites
-
-		# destory tooth at the beginning if he is not on a floor
-		if not [sprite for sprite in collision_sprites if sprite.rect.collidepoint(self.rect.midbottom + vector(0,10))]:
-			self.kill()
-
-	def animate(self, dt):
-		current_animation = self.animation_frames[f'run_{self.orientation}']
-		self.frame_index += ANIMATION_SPEED * dt
-		self.frame_index = 0 if self.frame_index >= len(current_animation) else self.frame_index
-		self.image = current_animation[int(self.frame_index)]
-		self.mask = pygame.mask.from_surface(self.image)
-
-	def move(self, dt):
-		right_gap = self.rect.bottomright + vector(1,1)
-		right_block = self.rect.midright + vector(1,0)
-		left_gap = self.rect.bottomleft + vector(-1,1)
-		left_block = self.rect.midleft + vector(-1,0)
-
-		if self.direction.x > 0: # moving right
-			# 1. no floor collision
-			floor_sprites = [sprite for sprite in self.collision_sprites if sprite.rect.collidepoint(right_gap)]
-			# 2. wall collision
-			wall_sprites = [sprite for sprite in self.collision_sprites if sprite.rect.collidepoint(right_block)]
-			if wall_sprites or not floor_sprites:
-				self.direction.x *= -1
-				self.orientation = 'left'
-
-		# exercise
-		if self.direction.x < 0:  
-			if not [sprite for sprite in self.collision_sprites if sprite.rect.collidepoint(left_gap)] \
-			or [sprite for sprite in self.collision_sprites if sprite.rect.collidepoint(left_block)]:
-				self.direction.x *= -1
-				self.orientation = 'right'
-
-		self.pos.x += self.direction.x * self.speed * dt
-		self.rect.x = round(self.pos.x)
-
-	def update(self, dt):
-		self.animate(dt)
-		self.move(dt)
+		self.mask = get_mask(self.image)
 
 class Shell(Generic):
-	def __init__(self, orientation, assets, pos, group, pearl_surf, damage_sprites):
+	sleeps = True
+
+	def __init__(self, orientation, assets, pos, group, pearls):
 		self.orientation = orientation
-		self.animation_frames = assets.copy()
-		if orientation == 'right':
-			for key, value in self.animation_frames.items():
-				self.animation_frames[key] = [pygame.transform.flip(surf,True,False) for surf in value]
+		self.animation_frames = get_mirrored(assets) if orientation == 'right' else assets
 
 		self.frame_index = 0
 		self.status = 'idle'
@@ -147,10 +82,9 @@ class Shell(Generic):
 		self.rect.bottom = self.rect.top + TILE_SIZE
 
 		# pearl 
-		self.pearl_surf = pearl_surf
+		self.pearls = pearls
 		self.has_shot = False
 		self.attack_cooldown = Timer(2000)
-		self.damage_sprites = damage_sprites 
 
 	def animate(self, dt):
 		current_animation = self.animation_frames[self.status]
@@ -165,7 +99,7 @@ class Shell(Generic):
 		if int(self.frame_index) == 2 and self.status == 'attack' and not self.has_shot:
 			pearl_direction = vector(-1,0) if self.orientation == 'left' else vector(1,0)
 			offset = (pearl_direction * 50) + vector(0,-10) if self.orientation == 'left' else (pearl_direction * 20) + vector(0,-10)
-			Pearl(self.rect.center + offset, pearl_direction, self.pearl_surf, [self.groups()[0], self.damage_sprites])
+			self.pearls.spawn(self.rect.center + offset, pearl_direction.x)
 			self.has_shot = True
 
 	def get_status(self):
@@ -179,32 +113,10 @@ class Shell(Generic):
 		self.animate(dt)
 		self.attack_cooldown.update()
 
-class Pearl(Generic):
-	def __init__(self, pos, direction, surf, group):
-		super().__init__(pos, surf, group)
-		self.mask = pygame.mask.from_surface(self.image)
-
-		# movement 
-		self.pos = vector(self.rect.topleft)
-		self.direction = direction
-		self.speed = 150
-
-		# self destruct 
-		self.timer = Timer(6000)
-		self.timer.activate()
-
-	def update(self, dt):
-		# movement 
-		self.pos.x += self.direction.x * self.speed * dt
-		self.rect.x = round(self.pos.x)
-
-		# timer 
-		self.timer.update()
-		if not self.timer.active:
-			self.kill()
-
 class Player(Generic):
-	def __init__(self, pos, assets, group, collision_sprites, jump_sound):
+	moving = True
+
+	def __init__(self, pos, assets, group, collision_map, jump_sound):
 		
 		# animation
 		self.animation_frames = assets
@@ -213,7 +125,7 @@ class Player(Generic):
 		self.orientation = 'right'
 		surf = self.animation_frames[f'{self.status}_{self.orientation}'][self.frame_index]
 		super().__init__(pos, surf, group)
-		self.mask = pygame.mask.from_surface(self.image)
+		self.mask = get_mask(self.image)
 
 		# movement
 		self.direction = vector()
@@ -223,7 +135,7 @@ class Player(Generic):
 		self.on_floor = False
 
 		# collision
-		self.collision_sprites = collision_sprites
+		self.collision_map = collision_map
 		self.hitbox = self.rect.inflate(-50,0)
 
 		# timer 
@@ -251,12 +163,10 @@ class Player(Generic):
 		self.frame_index += ANIMATION_SPEED * dt
 		self.frame_index = 0 if self.frame_index >= len(current_animation) else self.frame_index
 		self.image = current_animation[int(self.frame_index)]
-		self.mask = pygame.mask.from_surface(self.image)
+		self.mask = get_mask(self.image)
 
 		if self.invul_timer.active:
-			surf = self.mask.to_surface()
-			surf.set_colorkey('black')
-			self.image = surf
+			self.image = get_silhouette(self.image)
 
 	def input(self):
 		keys = pygame.key.get_pressed()
@@ -289,23 +199,23 @@ class Player(Generic):
 
 	def apply_gravity(self, dt):
 		self.direction.y += self.gravity * dt
-		self.rect.y += self.direction.y
 
 	def check_on_floor(self):
 		floor_rect = pygame.Rect(self.hitbox.bottomleft,(self.hitbox.width,2))
-		floor_sprites = [sprite for sprite in self.collision_sprites if sprite.rect.colliderect(floor_rect)]
-		self.on_floor = True if floor_sprites else False
+		self.on_floor = self.collision_map.collide_rect(floor_rect)
 
 	def collision(self, direction):
-		for sprite in self.collision_sprites:
-			if sprite.rect.colliderect(self.hitbox):
+		# the hitbox can be pushed while resolving, so look a little further around it
+		nearby_rects = self.collision_map.get_rects(self.hitbox.inflate(TILE_SIZE * 2, TILE_SIZE * 2))
+		for rect in nearby_rects:
+			if rect.colliderect(self.hitbox):
 				if direction == 'horizontal':
-					self.hitbox.right = sprite.rect.left if self.direction.x > 0 else self.hitbox.right
-					self.hitbox.left = sprite.rect.right if self.direction.x < 0 else self.hitbox.left
+					self.hitbox.right = rect.left if self.direction.x > 0 else self.hitbox.right
+					self.hitbox.left = rect.right if self.direction.x < 0 else self.hitbox.left
 					self.rect.centerx, self.pos.x = self.hitbox.centerx, self.hitbox.centerx
 				else: # vertical
-					self.hitbox.top = sprite.rect.bottom if self.direction.y < 0 else self.hitbox.top
-					self.hitbox.bottom = sprite.rect.top if self.direction.y > 0 else self.hitbox.bottom
+					self.hitbox.top = rect.bottom if self.direction.y < 0 else self.hitbox.top
+					self.hitbox.bottom = rect.top if self.direction.y > 0 else self.hitbox.bottom
 					self.rect.centery, self.pos.y = self.hitbox.centery, self.hitbox.centery
 					self.direction.y = 0
 
@@ -1,5 +1,49 @@
 import pygame
 from os import walk
+from weakref import WeakKeyDictionary
+from hashlib import sha1
+from math import lcm
+
+from settings import *
+
+# masks only depend on the frame, so every sprite showing it shares one
+mask_cache = WeakKeyDictionary()
+
+def get_mask(surf):
+	if surf not in mask_cache:
+		mask_cache[surf] = pygame.mask.from_surface(surf)
+	return mask_cache[surf]
+
+silhouette_cache = WeakKeyDictionary()
+
+def get_silhouette(surf):
+	# white hit flash version of a frame
+	if surf not in silhouette_cache:
+		silhouette = get_mask(surf).to_surface()
+		silhouette.set_colorkey('black')
+		silhouette_cache[surf] = silhouette
+	return silhouette_cache[surf]
+
+flip_cache = WeakKeyDictionary()
+mirror_cache = {}
+
+def get_flipped(surf):
+	if surf not in flip_cache:
+		flip_cache[surf] = pygame.transform.flip(surf, True, False)
+	return flip_cache[surf]
+
+def get_mirrored(frames):
+	# mirrored frame list (or dict of lists) with masks, built once per asset and shared by every sprite
+	key = id(frames)
+	if key not in mirror_cache:
+		if isinstance(frames, dict):
+			mirrored = {name: get_mirrored(value) for name, value in frames.items()}
+		else:
+			mirrored = [get_flipped(surf) for surf in frames]
+			for surf in mirrored:
+				get_mask(surf)
+		mirror_cache[key] = (frames, mirrored)
+	return mirror_cache[key][1]
 
 def import_folder(path):
 	surface_list = []
@@ -20,4 +64,131 @@ def import_folder_dict(path):
 			image_surf = pygame.image.load(full_path).convert_alpha()
 			surface_dict[image_name.split('.')[0]] = image_surf
 			
-	return surface_dict
\ No newline at end of file
+	return surface_dict
+
+def bake_chunks(tiles, chunk_size = CHUNK_SIZE):
+	animated_tiles = [(pos, [surf]) for pos, surf in tiles]
+	return [(pos, frames[0]) for pos, frames in bake_animated_chunks(animated_tiles, chunk_size)]
+
+def cluster_tiles(chunk_tiles, max_waste = CHUNK_MAX_WASTE):
+	# split a chunk into pieces whose surface is mostly covered, so sparse chunks don't bake empty space
+	clusters = []
+	for frames, rects in chunk_tiles:
+		rect = rects[0].unionall(rects)
+		for cluster in clusters:
+			area = cluster[1].union(rect)
+			covered = cluster[2] + rect.width * rect.height
+			if area.width * area.height <= covered * max_waste:
+				cluster[0].append((frames, rects))
+				cluster[1] = area
+				cluster[2] = covered
+				break
+		else:
+			clusters.append([[(frames, rects)], rect, rect.width * rect.height])
+	return [(members, area) for members, area, covered in clusters]
+
+def bake_animated_chunks(tiles, chunk_size = CHUNK_SIZE):
+	chunks = {}
+	for pos, frames in tiles:
+		rects = [surf.get_rect(topleft = pos) for surf in frames]
+		key = (int(pos[0] // (chunk_size * TILE_SIZE)), int(pos[1] // (chunk_size * TILE_SIZE)))
+		chunks.setdefault(key, []).append((frames, rects))
+
+	# every chunk loops through all tiles once, whatever their frame counts
+	frame_count = lcm(*[len(frames) for pos, frames in tiles]) if tiles else 0
+
+	baked = []
+	for chunk_tiles, area in [cluster for members in chunks.values() for cluster in cluster_tiles(members)]:
+		# a lone tile gains nothing from baking, so it keeps its shared frames
+		if len(chunk_tiles) == 1:
+			baked.append((area.topleft, chunk_tiles[0][0]))
+			continue
+
+		chunk_frames = []
+		for frame_index in range(frame_count):
+			chunk_surf = pygame.Surface(area.size, pygame.SRCALPHA).convert_alpha()
+			chunk_surf.fill((0,0,0,0))
+			for frames, rects in chunk_tiles:
+				index = frame_index % len(frames)
+				chunk_surf.blit(frames[index], (rects[index].x - area.x, rects[index].y - area.y))
+			chunk_frames.append(chunk_surf)
+		baked.append((area.topleft, chunk_frames))
+	return baked
+
+class Atlas:
+	def __init__(self, size = ATLAS_SIZE):
+		self.size = size
+		self.pages = []
+		self.frames = {}
+
+		# shelf packing
+		self.x = 0
+		self.y = 0
+		self.shelf_height = 0
+
+		# stats
+		self.requested = 0
+		self.requested_area = 0
+		self.used_area = 0
+
+	def new_page(self):
+		page = pygame.Surface((self.size, self.size), pygame.SRCALPHA).convert_alpha()
+		page.fill((0,0,0,0))
+		self.pages.append(page)
+		self.x, self.y, self.shelf_height = 0, 0, 0
+
+	def add(self, surf):
+		width, height = surf.get_size()
+		if width > self.size or height > self.size:
+			return surf
+
+		# only frames that end up on a page count towards the savings
+		self.requested += 1
+		self.requested_area += width * height
+
+		# identical frames share a single slot
+		key = (surf.get_size(), sha1(pygame.image.tobytes(surf, 'RGBA')).digest())
+		if key in self.frames:
+			return self.frames[key]
+
+		if self.x + width > self.size:
+			self.x, self.y, self.shelf_height = 0, self.y + self.shelf_height, 0
+		if not self.pages or self.y + height > self.size:
+			self.new_page()
+
+		page = self.pages[-1]
+		page.blit(surf, (self.x, self.y))
+		frame = page.subsurface((self.x, self.y, width, height))
+		self.frames[key] = frame
+
+		self.x += width
+		self.shelf_height = max(self.shelf_height, height)
+		self.used_area += width * height
+		return frame
+
+	def collect(self, assets):
+		if isinstance(assets, pygame.Surface):
+			return [assets]
+		values = assets.values() if isinstance(assets, dict) else assets
+		return [surf for value in values for surf in self.collect(value)]
+
+	def replace(self, assets, packed):
+		if isinstance(assets, pygame.Surface):
+			return packed[assets]
+		if isinstance(assets, dict):
+			return {key: self.replace(value, packed) for key, value in assets.items()}
+		return [self.replace(value, packed) for value in assets]
+
+	def pack(self, assets):
+		packed = {}
+		for surf in sorted(self.collect(assets), key = lambda surf: surf.get_height(), reverse = True):
+			packed[surf] = self.add(surf)
+		return self.replace(assets, packed)
+
+	def report(self):
+		page_area = len(self.pages) * self.size * self.size
+		occupancy = self.used_area / page_area if page_area else 0
+		saved = (self.requested_area - page_area) * 4
+		return (
+			f'{self.requested} frames packed as {len(self.frames)} unique frames on {len(self.pages)} {self.size}x{self.size} page(s), '
+			f'{occupancy:.0%} occupancy, {saved / 1024:.0f} KiB pixel memory saved')
\ No newline at end of file